@@ -0,0 +1,76 @@
+"""Numeric kernels used by the domain models.
+
+The kernels are compiled with Numba when it is installed; otherwise the
+pure-Python versions are used.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import warnings
+from array import array
+from typing import Sequence
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover - depends on the environment
+    njit = None
+
+# Below this many lines the JIT dispatch costs more than the loop itself.
+JIT_MIN_LINES = 1024
+
+_fallback_warned = False
+
+
+def _sum_by_category_py(cat_codes, totals_out, qty, unit_price) -> None:
+    for i in range(len(cat_codes)):
+        totals_out[cat_codes[i]] += qty[i] * unit_price[i]
+
+
+if njit is not None:
+    # ``NUMBA_BOUNDSCHECK=1`` re-enables bounds checking when debugging.
+    _sum_by_category_jit = njit(cache=True, boundscheck=False)(_sum_by_category_py)
+else:
+    _sum_by_category_jit = None
+
+
+def sum_by_category(
+    cat_codes: array, qty: array, unit_price: array, n_categories: int
+) -> Sequence[float]:
+    """Return the line totals summed per category code."""
+
+    totals_out = array("d", bytes(8 * n_categories))
+    if len(cat_codes) < JIT_MIN_LINES:
+        _sum_by_category_py(cat_codes, totals_out, qty, unit_price)
+    elif _sum_by_category_jit is not None:
+        _sum_by_category_jit(cat_codes, totals_out, qty, unit_price)
+    else:
+        _warn_fallback()
+        _sum_by_category_py(cat_codes, totals_out, qty, unit_price)
+    return totals_out
+
+
+def _warn_fallback() -> None:
+    global _fallback_warned
+    if not _fallback_warned:
+        _fallback_warned = True
+        warnings.warn(
+            "numba is not installed; large requests use the pure-Python aggregation",
+            RuntimeWarning,
+            stacklevel=_caller_stacklevel(),
+        )
+
+
+def _caller_stacklevel() -> int:
+    # Point the warning at the first frame outside this package, however deep
+    # the service -> budget -> model call chain that reached the kernel is.
+    package_dir = os.path.dirname(__file__) + os.sep
+    frame = sys._getframe(1)
+    level = 1
+    while frame.f_back is not None and frame.f_code.co_filename.startswith(package_dir):
+        frame = frame.f_back
+        level += 1
+    return level
+
+
+__all__ = ["JIT_MIN_LINES", "sum_by_category"]
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, List, Mapping, Sequence, Tuple
 
 from .models import BudgetRecord, PurchaseOrder, PurchaseRequest
 from .repository import ProcurementRepository
@@ -18,8 +18,20 @@ class BudgetController:
 
     repository: ProcurementRepository
 
-    def _totals_by_category(self, request: PurchaseRequest) -> Dict[str, float]:
-        return request.by_category_totals(self.repository.items)
+    def _totals_by_category(self, request: PurchaseRequest) -> Mapping[str, float]:
+        return request.by_category_totals(self.repository.item_categories)
+
+    def _configured_budgets(self, totals: Mapping[str, float]) -> List[Tuple[BudgetRecord, float]]:
+        # Resolve every budget before any is touched so a missing one cannot
+        # leave the others half updated.
+        get_budget = self.repository.get_budget_by_category
+        budgets = []
+        for category_id, total in totals.items():
+            record = get_budget(category_id)
+            if record is None:
+                raise BudgetError(f"No budget configured for category {category_id}")
+            budgets.append((record, total))
+        return budgets
 
     def validate_request_affordability(self, request: PurchaseRequest) -> None:
         """Ensure that enough budget exists for each category."""
@@ -39,10 +51,28 @@ class BudgetController:
     def reserve_for_request(self, request: PurchaseRequest) -> None:
         """Reserve funds for an approved purchase request."""
 
-        for category_id, total in self._totals_by_category(request).items():
-            record = self.repository.get_budget_by_category(category_id)
-            if record is None:
-                raise BudgetError(f"No budget configured for category {category_id}")
+        for record, total in self._configured_budgets(self._totals_by_category(request)):
+            record.reserve(total)
+
+    def reserve_for_requests(self, requests: Sequence[PurchaseRequest]) -> None:
+        """Reserve funds for several requests against their combined demand.
+
+        Raises ``BudgetError`` without reserving anything when any category
+        cannot cover the combined demand of all requests.
+        """
+
+        demand: Dict[str, float] = {}
+        for request in requests:
+            for category_id, total in self._totals_by_category(request).items():
+                demand[category_id] = demand.get(category_id, 0.0) + total
+        reservations = self._configured_budgets(demand)
+        for record, total in reservations:
+            if record.available < total - 1e-9:
+                raise BudgetError(
+                    f"Insufficient funds in budget {record.id} for category {record.category_id}: "
+                    f"available {record.available:.2f}, required {total:.2f}"
+                )
+        for record, total in reservations:
             record.reserve(total)
 
     def release_for_request(self, request: PurchaseRequest) -> None:
@@ -58,11 +88,7 @@ class BudgetController:
         """Spend committed funds when a purchase order is approved."""
 
         request = self.repository.get_purchase_request(order.request_id)
-        totals = request.by_category_totals(self.repository.items)
-        for category_id, total in totals.items():
-            record = self.repository.get_budget_by_category(category_id)
-            if record is None:
-                raise BudgetError(f"No budget configured for category {category_id}")
+        for record, total in self._configured_budgets(self._totals_by_category(request)):
             record.spend(total)
 
 
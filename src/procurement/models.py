@@ -1,42 +1,63 @@
 """Core domain models for the procurement system."""
 from __future__ import annotations
 
+import time
+from array import array
 from dataclasses import dataclass, field
-from datetime import datetime
-from enum import Enum
-from typing import Dict, Iterable, List, Optional
+from datetime import datetime, timezone
+from enum import IntEnum
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, overload
 
+from ._kernels import sum_by_category
 
-class RequestStatus(str, Enum):
+
+@overload
+def to_datetime(timestamp: float) -> datetime: ...
+
+
+@overload
+def to_datetime(timestamp: None) -> None: ...
+
+
+def to_datetime(timestamp: Optional[float]) -> Optional[datetime]:
+    """Convert an epoch timestamp to a timezone-aware UTC datetime."""
+
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+class RequestStatus(IntEnum):
     """Lifecycle of a purchase request."""
 
-    DRAFT = "draft"
-    SUBMITTED = "submitted"
-    APPROVED = "approved"
-    REJECTED = "rejected"
-    CANCELLED = "cancelled"
+    DRAFT = 0
+    SUBMITTED = 1
+    APPROVED = 2
+    REJECTED = 3
+    CANCELLED = 4
 
 
-class OrderStatus(str, Enum):
+class OrderStatus(IntEnum):
     """Lifecycle of a purchase order."""
 
-    DRAFT = "draft"
-    APPROVAL_PENDING = "approval_pending"
-    APPROVED = "approved"
-    REJECTED = "rejected"
-    CANCELLED = "cancelled"
+    DRAFT = 0
+    APPROVAL_PENDING = 1
+    APPROVED = 2
+    REJECTED = 3
+    CANCELLED = 4
 
 
-class PaymentStatus(str, Enum):
+class PaymentStatus(IntEnum):
     """Lifecycle of a payment request."""
 
-    DRAFT = "draft"
-    SUBMITTED = "submitted"
-    APPROVED = "approved"
-    REJECTED = "rejected"
+    DRAFT = 0
+    SUBMITTED = 1
+    APPROVED = 2
+    REJECTED = 3
 
 
-@dataclass
+@dataclass(slots=True)
 class ProductCategory:
     """Represents a grouping for similar product items."""
 
@@ -45,7 +66,7 @@ class ProductCategory:
     description: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class ProductItem:
     """Defines a purchasable item."""
 
@@ -56,7 +77,7 @@ class ProductItem:
     description: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class BudgetRecord:
     """Represents the financial constraints for a category."""
 
@@ -65,10 +86,23 @@ class BudgetRecord:
     allocated: float
     committed: float = 0.0
     spent: float = 0.0
+    # Kept in sync by the methods below. Do not assign allocated, committed,
+    # spent or available directly; use adjust_allocation/reserve/release/spend.
+    available: float = field(init=False, compare=False)
 
-    @property
-    def available(self) -> float:
-        return self.allocated - self.committed - self.spent
+    def __post_init__(self) -> None:
+        self._refresh_available()
+
+    def _refresh_available(self) -> None:
+        self.available = self.allocated - self.committed - self.spent
+
+    def adjust_allocation(self, amount: float) -> None:
+        """Add ``amount`` (negative to reduce) to the allocated budget."""
+
+        if self.allocated + amount < self.committed + self.spent - 1e-9:
+            raise ValueError("Allocation cannot drop below committed and spent amounts")
+        self.allocated += amount
+        self._refresh_available()
 
     def reserve(self, amount: float) -> None:
         if amount < 0:
@@ -76,6 +110,7 @@ class BudgetRecord:
         if amount > self.available + 1e-9:
             raise ValueError("Insufficient available budget to reserve")
         self.committed += amount
+        self._refresh_available()
 
     def release(self, amount: float) -> None:
         if amount < 0:
@@ -83,6 +118,7 @@ class BudgetRecord:
         if amount > self.committed + 1e-9:
             raise ValueError("Cannot release more than committed")
         self.committed -= amount
+        self._refresh_available()
 
     def spend(self, amount: float) -> None:
         if amount < 0:
@@ -93,9 +129,10 @@ class BudgetRecord:
         committed_reduction = min(self.committed, amount)
         self.committed -= committed_reduction
         self.spent += amount
+        self._refresh_available()
 
 
-@dataclass
+@dataclass(slots=True)
 class PurchaseRequestItem:
     """Line item for a purchase request."""
 
@@ -108,7 +145,7 @@ class PurchaseRequestItem:
         return self.quantity * self.unit_price
 
 
-@dataclass
+@dataclass(slots=True)
 class PurchaseRequest:
     """Aggregates requested items and approval metadata."""
 
@@ -117,27 +154,105 @@ class PurchaseRequest:
     justification: str
     items: List[PurchaseRequestItem] = field(default_factory=list)
     status: RequestStatus = RequestStatus.DRAFT
-    created_at: datetime = field(default_factory=datetime.utcnow)
-    submitted_at: Optional[datetime] = None
-    approved_at: Optional[datetime] = None
-    rejected_at: Optional[datetime] = None
+    created_at: float = field(default_factory=time.time)
+    submitted_at: Optional[float] = None
+    approved_at: Optional[float] = None
+    rejected_at: Optional[float] = None
+    _items_version: int = field(default=0, init=False, repr=False, compare=False)
+    _cat_totals_cache: Optional[Tuple[int, Mapping[str, float]]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # Columnar copies of the line items keyed by dense category codes; only
+    # trusted while ``_columns_version`` matches ``_items_version``.
+    _qty: array = field(default_factory=lambda: array("d"), init=False, repr=False, compare=False)
+    _unit_price: array = field(default_factory=lambda: array("d"), init=False, repr=False, compare=False)
+    _cat_code: array = field(default_factory=lambda: array("i"), init=False, repr=False, compare=False)
+    _category_ids: Sequence[str] = field(default=(), init=False, repr=False, compare=False)
+    _columns_version: int = field(default=-1, init=False, repr=False, compare=False)
+    _total_cache: Optional[float] = field(default=None, init=False, repr=False, compare=False)
 
     @property
-    def total_amount(self) -> float:
-        return sum(item.total_price for item in self.items)
+    def created_at_dt(self) -> datetime:
+        return to_datetime(self.created_at)
 
-    def by_category_totals(self, item_catalogue: Dict[str, ProductItem]) -> Dict[str, float]:
-        totals: Dict[str, float] = {}
-        for line in self.items:
-            if line.item_id not in item_catalogue:
-                raise KeyError(f"Unknown item '{line.item_id}' referenced by request {self.id}")
-            category_id = item_catalogue[line.item_id].category_id
-            totals.setdefault(category_id, 0.0)
-            totals[category_id] += line.total_price
-        return totals
+    @property
+    def submitted_at_dt(self) -> Optional[datetime]:
+        return to_datetime(self.submitted_at)
 
+    @property
+    def approved_at_dt(self) -> Optional[datetime]:
+        return to_datetime(self.approved_at)
 
-@dataclass
+    @property
+    def rejected_at_dt(self) -> Optional[datetime]:
+        return to_datetime(self.rejected_at)
+
+    @property
+    def total_amount(self) -> float:
+        if self._total_cache is None:
+            self._total_cache = sum(item.total_price for item in self.items)
+        return self._total_cache
+
+    def add_item(self, item: PurchaseRequestItem) -> None:
+        """Append a line item, invalidating cached totals."""
+
+        self.items.append(item)
+        self.invalidate_totals()
+
+    def invalidate_totals(self) -> None:
+        """Discard cached totals after ``items`` has been mutated directly."""
+
+        self._items_version += 1
+        self._total_cache = None
+
+    def index_lines(self, category_codes: Sequence[int], category_ids: Sequence[str]) -> None:
+        """Store the line items column-wise using dense category codes.
+
+        ``category_codes`` holds the code of each line's category and
+        ``category_ids`` maps every code back to its category id.
+        """
+
+        if len(category_codes) != len(self.items):
+            raise ValueError("Expected one category code per line item")
+        self._qty = array("d", [line.quantity for line in self.items])
+        self._unit_price = array("d", [line.unit_price for line in self.items])
+        self._cat_code = array("i", category_codes)
+        self._category_ids = category_ids
+        self._columns_version = self._items_version
+
+    def by_category_totals(self, item_categories: Mapping[str, str]) -> Mapping[str, float]:
+        """Sum line totals per category as a read-only mapping.
+
+        ``item_categories`` maps item ids to category ids. The result is cached
+        until ``add_item`` or ``invalidate_totals`` is called: appending to
+        ``items`` directly, or passing a different ``item_categories`` later,
+        does not refresh it.
+        """
+
+        cached = self._cat_totals_cache
+        if cached is not None and cached[0] == self._items_version:
+            return cached[1]
+        totals: Dict[str, float]
+        if self._columns_version == self._items_version:
+            totals = self._column_category_totals()
+        else:
+            totals = {}
+            for line in self.items:
+                category_id = item_categories.get(line.item_id)
+                if category_id is None:
+                    raise KeyError(f"Unknown item '{line.item_id}' referenced by request {self.id}")
+                totals[category_id] = totals.get(category_id, 0.0) + line.quantity * line.unit_price
+        view = MappingProxyType(totals)
+        self._cat_totals_cache = (self._items_version, view)
+        return view
+
+    def _column_category_totals(self) -> Dict[str, float]:
+        sums = sum_by_category(self._cat_code, self._qty, self._unit_price, len(self._category_ids))
+        # Keep categories in order of first appearance, like the row-wise path.
+        return {self._category_ids[code]: sums[code] for code in dict.fromkeys(self._cat_code)}
+
+
+@dataclass(slots=True)
 class PurchaseOrderItem:
     """Line item on a purchase order."""
 
@@ -150,7 +265,7 @@ class PurchaseOrderItem:
         return self.quantity * self.unit_price
 
 
-@dataclass
+@dataclass(slots=True)
 class PurchaseOrder:
     """Formal order issued to a supplier."""
 
@@ -159,15 +274,37 @@ class PurchaseOrder:
     supplier: str
     items: List[PurchaseOrderItem] = field(default_factory=list)
     status: OrderStatus = OrderStatus.DRAFT
-    created_at: datetime = field(default_factory=datetime.utcnow)
-    approved_at: Optional[datetime] = None
+    created_at: float = field(default_factory=time.time)
+    approved_at: Optional[float] = None
+    _total_cache: Optional[float] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def created_at_dt(self) -> datetime:
+        return to_datetime(self.created_at)
+
+    @property
+    def approved_at_dt(self) -> Optional[datetime]:
+        return to_datetime(self.approved_at)
 
     @property
     def total_amount(self) -> float:
-        return sum(item.total_price for item in self.items)
+        if self._total_cache is None:
+            self._total_cache = sum(item.total_price for item in self.items)
+        return self._total_cache
+
+    def add_item(self, item: PurchaseOrderItem) -> None:
+        """Append a line item, invalidating the cached total."""
 
+        self.items.append(item)
+        self.invalidate_totals()
 
-@dataclass
+    def invalidate_totals(self) -> None:
+        """Discard the cached total after ``items`` has been mutated directly."""
+
+        self._total_cache = None
+
+
+@dataclass(slots=True)
 class PaymentRequest:
     """Request to disburse funds for a purchase order."""
 
@@ -176,17 +313,22 @@ class PaymentRequest:
     amount: float
     payee: str
     status: PaymentStatus = PaymentStatus.DRAFT
-    created_at: datetime = field(default_factory=datetime.utcnow)
-    approved_at: Optional[datetime] = None
+    created_at: float = field(default_factory=time.time)
+    approved_at: Optional[float] = None
+
+    @property
+    def created_at_dt(self) -> datetime:
+        return to_datetime(self.created_at)
+
+    @property
+    def approved_at_dt(self) -> Optional[datetime]:
+        return to_datetime(self.approved_at)
 
 
 def clone_request_items(request: PurchaseRequest) -> List[PurchaseOrderItem]:
     """Clone purchase request items into order items."""
 
-    return [
-        PurchaseOrderItem(item_id=line.item_id, quantity=line.quantity, unit_price=line.unit_price)
-        for line in request.items
-    ]
+    return [PurchaseOrderItem(line.item_id, line.quantity, line.unit_price) for line in request.items]
 
 
 def ensure_positive_quantity(items: Iterable[PurchaseRequestItem]) -> None:
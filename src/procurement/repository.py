@@ -1,8 +1,9 @@
 """In-memory repositories for procurement entities."""
 from __future__ import annotations
 
+import sys
 from dataclasses import dataclass, field
-from typing import Dict, Iterable, Optional
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
 
 from .models import (
     BudgetRecord,
@@ -24,55 +25,117 @@ class ProcurementRepository:
     purchase_requests: Dict[str, PurchaseRequest] = field(default_factory=dict)
     purchase_orders: Dict[str, PurchaseOrder] = field(default_factory=dict)
     payment_requests: Dict[str, PaymentRequest] = field(default_factory=dict)
+    _budget_by_category: Dict[str, BudgetRecord] = field(default_factory=dict, repr=False)
+    _category_codes: Dict[str, int] = field(default_factory=dict, repr=False)
+    _category_ids: List[str] = field(default_factory=list, repr=False)
+    _item_category_codes: Dict[str, int] = field(default_factory=dict, repr=False)
+    _item_category: Dict[str, str] = field(default_factory=dict, repr=False)
+    _orders_by_request: Dict[str, List[PurchaseOrder]] = field(default_factory=dict, repr=False)
+    # Request id each order was indexed under, in case it changes before a re-save.
+    _order_request_ids: Dict[str, str] = field(default_factory=dict, repr=False)
 
     def add_category(self, category: ProductCategory) -> None:
+        category.id = sys.intern(category.id)
         if category.id in self.categories:
             raise ValueError(f"Category {category.id} already exists")
         self.categories[category.id] = category
+        self._category_codes[category.id] = len(self._category_ids)
+        self._category_ids.append(category.id)
 
     def add_item(self, item: ProductItem) -> None:
+        item.id = sys.intern(item.id)
+        item.category_id = sys.intern(item.category_id)
         if item.category_id not in self.categories:
             raise KeyError(f"Category {item.category_id} does not exist")
         if item.id in self.items:
             raise ValueError(f"Item {item.id} already exists")
         self.items[item.id] = item
+        self._item_category_codes[item.id] = self._category_codes[item.category_id]
+        self._item_category[item.id] = item.category_id
 
     def add_budget(self, budget: BudgetRecord) -> None:
+        budget.id = sys.intern(budget.id)
+        budget.category_id = sys.intern(budget.category_id)
         if budget.category_id not in self.categories:
             raise KeyError(f"Category {budget.category_id} does not exist")
         if budget.id in self.budgets:
             raise ValueError(f"Budget {budget.id} already exists")
         self.budgets[budget.id] = budget
+        # The first budget registered for a category is the one that is used.
+        self._budget_by_category.setdefault(budget.category_id, budget)
 
     def get_budget_by_category(self, category_id: str) -> Optional[BudgetRecord]:
-        return next((b for b in self.budgets.values() if b.category_id == category_id), None)
+        return self._budget_by_category.get(category_id)
+
+    @property
+    def category_ids(self) -> Sequence[str]:
+        """Category ids indexed by their dense category code."""
+
+        return self._category_ids
+
+    @property
+    def item_categories(self) -> Mapping[str, str]:
+        """Category id of every item, keyed by item id."""
+
+        return self._item_category
+
+    def get_category_of_item(self, item_id: str) -> str:
+        category_id = self._item_category.get(item_id)
+        if category_id is None:
+            raise KeyError(f"Item {item_id} does not exist")
+        return category_id
+
+    def item_category_codes(self, item_ids: Iterable[str]) -> List[int]:
+        codes = self._item_category_codes
+        return [codes[item_id] for item_id in item_ids]
 
     def save_purchase_request(self, request: PurchaseRequest) -> None:
+        request.id = sys.intern(request.id)
         self.purchase_requests[request.id] = request
 
     def get_purchase_request(self, request_id: str) -> PurchaseRequest:
-        if request_id not in self.purchase_requests:
+        request = self.purchase_requests.get(request_id)
+        if request is None:
             raise KeyError(f"Purchase request {request_id} not found")
-        return self.purchase_requests[request_id]
+        return request
 
     def save_purchase_order(self, order: PurchaseOrder) -> None:
+        order.id = sys.intern(order.id)
+        order.request_id = sys.intern(order.request_id)
+        previous = self.purchase_orders.get(order.id)
+        old_request_id = self._order_request_ids.get(order.id)
         self.purchase_orders[order.id] = order
+        self._order_request_ids[order.id] = order.request_id
+        if previous is not None and old_request_id is not None:
+            old_orders = self._orders_by_request.get(old_request_id, [])
+            for position, indexed in enumerate(old_orders):
+                if indexed is previous:
+                    if old_request_id == order.request_id:
+                        old_orders[position] = order
+                        return
+                    del old_orders[position]
+                    break
+        self._orders_by_request.setdefault(order.request_id, []).append(order)
 
     def get_purchase_order(self, order_id: str) -> PurchaseOrder:
-        if order_id not in self.purchase_orders:
+        order = self.purchase_orders.get(order_id)
+        if order is None:
             raise KeyError(f"Purchase order {order_id} not found")
-        return self.purchase_orders[order_id]
+        return order
 
     def save_payment_request(self, request: PaymentRequest) -> None:
+        request.id = sys.intern(request.id)
+        request.purchase_order_id = sys.intern(request.purchase_order_id)
         self.payment_requests[request.id] = request
 
     def get_payment_request(self, request_id: str) -> PaymentRequest:
-        if request_id not in self.payment_requests:
+        request = self.payment_requests.get(request_id)
+        if request is None:
             raise KeyError(f"Payment request {request_id} not found")
-        return self.payment_requests[request_id]
+        return request
 
     def iter_purchase_orders_for_request(self, request_id: str) -> Iterable[PurchaseOrder]:
-        return (order for order in self.purchase_orders.values() if order.request_id == request_id)
+        return iter(self._orders_by_request.get(request_id, ()))
 
 
 __all__ = ["ProcurementRepository"]
@@ -1,8 +1,8 @@
 """High level services for the procurement system."""
 from __future__ import annotations
 
-from dataclasses import replace
-from typing import Optional, Sequence
+import time
+from typing import List, Optional, Sequence
 
 from .budget import BudgetController, BudgetError
 from .exceptions import EntityNotFound, InvalidStatusTransition
@@ -63,49 +63,76 @@ class ProcurementService:
         items: Sequence[PurchaseRequestItem],
     ) -> PurchaseRequest:
         ensure_positive_quantity(items)
-        for item in items:
-            if item.item_id not in self.repository.items:
-                raise EntityNotFound(f"Unknown product item {item.item_id}")
+        missing = {item.item_id for item in items}.difference(self.repository.items)
+        if missing:
+            raise EntityNotFound(f"Unknown product items: {sorted(missing)}")
         request = PurchaseRequest(
             id=request_id,
             requester=requester,
             justification=justification,
             items=list(items),
         )
+        request.index_lines(
+            self.repository.item_category_codes(item.item_id for item in request.items),
+            self.repository.category_ids,
+        )
         self.repository.save_purchase_request(request)
         return request
 
-    def submit_purchase_request(self, request_id: str) -> PurchaseRequest:
+    def submit_purchase_request(self, request_id: str, now: Optional[float] = None) -> PurchaseRequest:
         request = self.repository.get_purchase_request(request_id)
-        if request.status != RequestStatus.DRAFT:
+        if not request_workflow.allows(request.status, RequestStatus.SUBMITTED):
             raise InvalidStatusTransition("Only draft requests can be submitted")
-        request_workflow.transition(request, request.status, RequestStatus.SUBMITTED)
+        request_workflow.apply(request, request.status, RequestStatus.SUBMITTED, now)
         request.status = RequestStatus.SUBMITTED
         return request
 
-    def approve_purchase_request(self, request_id: str) -> PurchaseRequest:
+    def approve_purchase_request(self, request_id: str, now: Optional[float] = None) -> PurchaseRequest:
         request = self.repository.get_purchase_request(request_id)
-        if request.status != RequestStatus.SUBMITTED:
+        if not request_workflow.allows(request.status, RequestStatus.APPROVED):
             raise InvalidStatusTransition("Only submitted requests can be approved")
         self.budget_controller.validate_request_affordability(request)
-        request_workflow.transition(request, request.status, RequestStatus.APPROVED)
+        request_workflow.apply(request, request.status, RequestStatus.APPROVED, now)
         request.status = RequestStatus.APPROVED
         self.budget_controller.reserve_for_request(request)
         return request
 
-    def reject_purchase_request(self, request_id: str) -> PurchaseRequest:
+    def approve_purchase_requests(
+        self, request_ids: Sequence[str], now: Optional[float] = None
+    ) -> List[PurchaseRequest]:
+        """Approve several submitted requests with one combined budget check.
+
+        The batch is all or nothing: if the combined demand does not fit the
+        budgets, ``BudgetError`` is raised and no request is approved.
+        """
+
+        requests = [
+            self.repository.get_purchase_request(request_id) for request_id in dict.fromkeys(request_ids)
+        ]
+        for request in requests:
+            if not request_workflow.allows(request.status, RequestStatus.APPROVED):
+                raise InvalidStatusTransition("Only submitted requests can be approved")
+        if now is None:
+            now = time.time()
+        self.budget_controller.reserve_for_requests(requests)
+        for request in requests:
+            request_workflow.apply(request, request.status, RequestStatus.APPROVED, now)
+            request.status = RequestStatus.APPROVED
+        return requests
+
+    def reject_purchase_request(self, request_id: str, now: Optional[float] = None) -> PurchaseRequest:
         request = self.repository.get_purchase_request(request_id)
-        if request.status != RequestStatus.SUBMITTED:
+        if not request_workflow.allows(request.status, RequestStatus.REJECTED):
             raise InvalidStatusTransition("Only submitted requests can be rejected")
-        request_workflow.transition(request, request.status, RequestStatus.REJECTED)
+        request_workflow.apply(request, request.status, RequestStatus.REJECTED, now)
         request.status = RequestStatus.REJECTED
         return request
 
-    def cancel_purchase_request(self, request_id: str) -> PurchaseRequest:
+    def cancel_purchase_request(self, request_id: str, now: Optional[float] = None) -> PurchaseRequest:
         request = self.repository.get_purchase_request(request_id)
-        if request.status != RequestStatus.APPROVED:
+        if not request_workflow.allows(request.status, RequestStatus.CANCELLED):
             raise InvalidStatusTransition("Only approved requests can be cancelled")
-        request_workflow.transition(request, request.status, RequestStatus.CANCELLED)
+        request_workflow.apply(request, request.status, RequestStatus.CANCELLED, now)
         request.status = RequestStatus.CANCELLED
         self.budget_controller.release_for_request(request)
         return request
@@ -124,33 +151,33 @@ class ProcurementService:
         if items is None:
             order_items = clone_request_items(request)
         else:
-            order_items = [replace(item) for item in items]
+            order_items = [PurchaseOrderItem(item.item_id, item.quantity, item.unit_price) for item in items]
         order = PurchaseOrder(id=order_id, request_id=request_id, supplier=supplier, items=order_items)
         self.repository.save_purchase_order(order)
         return order
 
-    def submit_purchase_order(self, order_id: str) -> PurchaseOrder:
+    def submit_purchase_order(self, order_id: str, now: Optional[float] = None) -> PurchaseOrder:
         order = self.repository.get_purchase_order(order_id)
-        if order.status != OrderStatus.DRAFT:
+        if not order_workflow.allows(order.status, OrderStatus.APPROVAL_PENDING):
             raise InvalidStatusTransition("Only draft orders can be submitted for approval")
-        order_workflow.transition(order, order.status, OrderStatus.APPROVAL_PENDING)
+        order_workflow.apply(order, order.status, OrderStatus.APPROVAL_PENDING, now)
         order.status = OrderStatus.APPROVAL_PENDING
         return order
 
-    def approve_purchase_order(self, order_id: str) -> PurchaseOrder:
+    def approve_purchase_order(self, order_id: str, now: Optional[float] = None) -> PurchaseOrder:
         order = self.repository.get_purchase_order(order_id)
-        if order.status != OrderStatus.APPROVAL_PENDING:
+        if not order_workflow.allows(order.status, OrderStatus.APPROVED):
             raise InvalidStatusTransition("Only orders pending approval can be approved")
-        order_workflow.transition(order, order.status, OrderStatus.APPROVED)
+        order_workflow.apply(order, order.status, OrderStatus.APPROVED, now)
         order.status = OrderStatus.APPROVED
         self.budget_controller.spend_for_order(order)
         return order
 
-    def reject_purchase_order(self, order_id: str) -> PurchaseOrder:
+    def reject_purchase_order(self, order_id: str, now: Optional[float] = None) -> PurchaseOrder:
         order = self.repository.get_purchase_order(order_id)
-        if order.status != OrderStatus.APPROVAL_PENDING:
+        if not order_workflow.allows(order.status, OrderStatus.REJECTED):
             raise InvalidStatusTransition("Only orders pending approval can be rejected")
-        order_workflow.transition(order, order.status, OrderStatus.REJECTED)
+        order_workflow.apply(order, order.status, OrderStatus.REJECTED, now)
         order.status = OrderStatus.REJECTED
         return order
 
@@ -173,27 +200,27 @@ class ProcurementService:
         self.repository.save_payment_request(payment)
         return payment
 
-    def submit_payment_request(self, payment_id: str) -> PaymentRequest:
+    def submit_payment_request(self, payment_id: str, now: Optional[float] = None) -> PaymentRequest:
         payment = self.repository.get_payment_request(payment_id)
-        if payment.status != PaymentStatus.DRAFT:
+        if not payment_workflow.allows(payment.status, PaymentStatus.SUBMITTED):
             raise InvalidStatusTransition("Only draft payments can be submitted")
-        payment_workflow.transition(payment, payment.status, PaymentStatus.SUBMITTED)
+        payment_workflow.apply(payment, payment.status, PaymentStatus.SUBMITTED, now)
         payment.status = PaymentStatus.SUBMITTED
         return payment
 
-    def approve_payment_request(self, payment_id: str) -> PaymentRequest:
+    def approve_payment_request(self, payment_id: str, now: Optional[float] = None) -> PaymentRequest:
         payment = self.repository.get_payment_request(payment_id)
-        if payment.status != PaymentStatus.SUBMITTED:
+        if not payment_workflow.allows(payment.status, PaymentStatus.APPROVED):
             raise InvalidStatusTransition("Only submitted payments can be approved")
-        payment_workflow.transition(payment, payment.status, PaymentStatus.APPROVED)
+        payment_workflow.apply(payment, payment.status, PaymentStatus.APPROVED, now)
         payment.status = PaymentStatus.APPROVED
         return payment
 
-    def reject_payment_request(self, payment_id: str) -> PaymentRequest:
+    def reject_payment_request(self, payment_id: str, now: Optional[float] = None) -> PaymentRequest:
         payment = self.repository.get_payment_request(payment_id)
-        if payment.status != PaymentStatus.SUBMITTED:
+        if not payment_workflow.allows(payment.status, PaymentStatus.REJECTED):
             raise InvalidStatusTransition("Only submitted payments can be rejected")
-        payment_workflow.transition(payment, payment.status, PaymentStatus.REJECTED)
+        payment_workflow.apply(payment, payment.status, PaymentStatus.REJECTED, now)
         payment.status = PaymentStatus.REJECTED
         return payment
 
@@ -1,9 +1,9 @@
 """Workflow helpers for approvals."""
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Callable, Dict, Iterable
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
 
 from .models import OrderStatus, PaymentStatus, RequestStatus
 
@@ -12,32 +12,85 @@ from .models import OrderStatus, PaymentStatus, RequestStatus
 class Transition:
     """Represents a valid state transition."""
 
-    source: str
-    target: str
+    source: int
+    target: int
     validator: Callable[[object], None] | None = None
-    post_action: Callable[[object], None] | None = None
+    post_action: Callable[[object, float], None] | None = None
+    # Callback specialised once for whichever hooks are present.
+    dispatch: Callable[[object, float], None] = field(init=False, repr=False, compare=False)
 
-    def execute(self, instance: object) -> None:
-        if self.validator:
-            self.validator(instance)
-        if self.post_action:
-            self.post_action(instance)
+    def __post_init__(self) -> None:
+        validator, post_action = self.validator, self.post_action
+        if validator is None and post_action is None:
+            dispatch = _noop
+        elif validator is None:
+            dispatch = post_action
+        elif post_action is None:
+
+            def dispatch(instance: object, now: float) -> None:
+                validator(instance)
+
+        else:
+
+            def dispatch(instance: object, now: float) -> None:
+                validator(instance)
+                post_action(instance, now)
+
+        object.__setattr__(self, "dispatch", dispatch)
+
+    def execute(self, instance: object, now: float | None = None) -> None:
+        self.dispatch(instance, now if now is not None else time.time())
+
+
+def _noop(instance: object, now: float) -> None:
+    return None
 
 
 class Workflow:
     """Generic workflow engine for simple state transitions."""
 
     def __init__(self, transitions: Iterable[Transition]):
-        self._transitions: Dict[tuple[str, str], Transition] = {
-            (transition.source, transition.target): transition
-            for transition in transitions
-        }
+        transitions = list(transitions)
+        size = 1 + max((max(t.source, t.target) for t in transitions), default=-1)
+        allowed = [0] * size
+        dispatch: list[Callable[[object, float], None] | None] = [None] * (size * size)
+        for transition in transitions:
+            allowed[transition.source] |= 1 << transition.target
+            dispatch[transition.source * size + transition.target] = transition.dispatch
+        # Bit ``target`` of ``_allowed[source]`` is set for every legal transition;
+        # the callback for it sits at ``_dispatch[source * _size + target]``.
+        self._size = size
+        self._allowed: tuple[int, ...] = tuple(allowed)
+        self._dispatch: tuple[Callable[[object, float], None] | None, ...] = tuple(dispatch)
+
+    def allows(self, source: int, target: int) -> bool:
+        """Return whether ``source -> target`` is a legal transition."""
+
+        size = self._size
+        return 0 <= source < size and 0 <= target < size and bool((self._allowed[source] >> target) & 1)
+
+    def transition(
+        self, instance: object, source: int, target: int, now: float | None = None
+    ) -> None:
+        """Run the hooks for ``source -> target``.
+
+        ``now`` is the epoch timestamp recorded by the post action; batch callers can
+        pass one shared value instead of reading the clock per transition.
+        """
+
+        if not self.allows(source, target):
+            raise ValueError(f"Invalid transition {source!r} -> {target!r}")
+        dispatch = self._dispatch[source * self._size + target]
+        dispatch(instance, now if now is not None else time.time())
+
+    def apply(self, instance: object, source: int, target: int, now: float | None = None) -> None:
+        """Run the hooks for ``source -> target`` without re-checking it.
+
+        Only for callers that have already checked the move with ``allows``.
+        """
 
-    def transition(self, instance: object, source: str, target: str) -> None:
-        key = (source, target)
-        if key not in self._transitions:
-            raise ValueError(f"Invalid transition {source} -> {target}")
-        self._transitions[key].execute(instance)
+        dispatch = self._dispatch[source * self._size + target]
+        dispatch(instance, now if now is not None else time.time())
 
 
 request_workflow = Workflow(
@@ -45,22 +98,22 @@ request_workflow = Workflow(
         Transition(
             source=RequestStatus.DRAFT,
             target=RequestStatus.SUBMITTED,
-            post_action=lambda request: setattr(request, "submitted_at", datetime.utcnow()),
+            post_action=lambda request, now: setattr(request, "submitted_at", now),
         ),
         Transition(
             source=RequestStatus.SUBMITTED,
             target=RequestStatus.APPROVED,
-            post_action=lambda request: setattr(request, "approved_at", datetime.utcnow()),
+            post_action=lambda request, now: setattr(request, "approved_at", now),
         ),
         Transition(
             source=RequestStatus.SUBMITTED,
             target=RequestStatus.REJECTED,
-            post_action=lambda request: setattr(request, "rejected_at", datetime.utcnow()),
+            post_action=lambda request, now: setattr(request, "rejected_at", now),
         ),
         Transition(
             source=RequestStatus.APPROVED,
             target=RequestStatus.CANCELLED,
-            post_action=lambda request: setattr(request, "rejected_at", datetime.utcnow()),
+            post_action=lambda request, now: setattr(request, "rejected_at", now),
         ),
     ]
 )
@@ -70,22 +123,21 @@ order_workflow = Workflow(
         Transition(
             source=OrderStatus.DRAFT,
             target=OrderStatus.APPROVAL_PENDING,
-            post_action=lambda order: None,
         ),
         Transition(
             source=OrderStatus.APPROVAL_PENDING,
             target=OrderStatus.APPROVED,
-            post_action=lambda order: setattr(order, "approved_at", datetime.utcnow()),
+            post_action=lambda order, now: setattr(order, "approved_at", now),
         ),
         Transition(
             source=OrderStatus.APPROVAL_PENDING,
             target=OrderStatus.REJECTED,
-            post_action=lambda order: setattr(order, "approved_at", datetime.utcnow()),
+            post_action=lambda order, now: setattr(order, "approved_at", now),
         ),
         Transition(
             source=OrderStatus.APPROVED,
             target=OrderStatus.CANCELLED,
-            post_action=lambda order: setattr(order, "approved_at", datetime.utcnow()),
+            post_action=lambda order, now: setattr(order, "approved_at", now),
         ),
     ]
 )
@@ -95,17 +147,17 @@ payment_workflow = Workflow(
         Transition(
             source=PaymentStatus.DRAFT,
             target=PaymentStatus.SUBMITTED,
-            post_action=lambda payment: setattr(payment, "approved_at", None),
+            post_action=lambda payment, now: setattr(payment, "approved_at", None),
         ),
         Transition(
             source=PaymentStatus.SUBMITTED,
             target=PaymentStatus.APPROVED,
-            post_action=lambda payment: setattr(payment, "approved_at", datetime.utcnow()),
+            post_action=lambda payment, now: setattr(payment, "approved_at", now),
         ),
         Transition(
             source=PaymentStatus.SUBMITTED,
             target=PaymentStatus.REJECTED,
-            post_action=lambda payment: setattr(payment, "approved_at", datetime.utcnow()),
+            post_action=lambda payment, now: setattr(payment, "approved_at", now),
         ),
     ]
 )
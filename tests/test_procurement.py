@@ -1,13 +1,19 @@
+from datetime import datetime, timezone
+
 import pytest
 
 from procurement import (
     BudgetError,
+    EntityNotFound,
+    InvalidStatusTransition,
     OrderStatus,
     PaymentStatus,
     ProcurementService,
     RequestStatus,
 )
-from procurement.models import PurchaseRequestItem
+from procurement import _kernels
+from procurement.models import BudgetRecord, PurchaseOrder, PurchaseOrderItem, PurchaseRequest, PurchaseRequestItem
+from procurement.workflows import request_workflow
 
 
 @pytest.fixture()
@@ -71,3 +77,269 @@ def test_budget_violation(service: ProcurementService) -> None:
     service.submit_purchase_request("PR-002")
     with pytest.raises(BudgetError):
         service.approve_purchase_request("PR-002")
+
+
+def test_category_totals_track_item_changes(service: ProcurementService) -> None:
+    request = service.create_purchase_request(
+        "PR-003",
+        requester="Carol",
+        justification="Paper",
+        items=[PurchaseRequestItem(item_id="paper", quantity=2, unit_price=5.0)],
+    )
+    catalogue = service.repository.item_categories
+    assert request.by_category_totals(catalogue) == {"office": 10.0}
+
+    assert request.total_amount == 10.0
+
+    request.add_item(PurchaseRequestItem(item_id="laptop", quantity=1, unit_price=1000.0))
+    assert request.by_category_totals(catalogue) == {"office": 10.0, "it": 1000.0}
+    assert request.total_amount == 1010.0
+
+    totals = request.by_category_totals(catalogue)
+    with pytest.raises(TypeError):
+        totals["office"] = 0.0  # type: ignore[index]
+
+    request.items.append(PurchaseRequestItem(item_id="paper", quantity=1, unit_price=5.0))
+    assert request.by_category_totals(catalogue) == {"office": 10.0, "it": 1000.0}
+    request.invalidate_totals()
+    assert request.by_category_totals(catalogue) == {"office": 15.0, "it": 1000.0}
+    assert request.total_amount == 1015.0
+
+
+def test_unknown_items_are_reported_together(service: ProcurementService) -> None:
+    with pytest.raises(EntityNotFound, match=r"\['desk', 'lamp'\]"):
+        service.create_purchase_request(
+            "PR-004",
+            requester="Dan",
+            justification="Furniture",
+            items=[
+                PurchaseRequestItem(item_id="lamp", quantity=1, unit_price=30.0),
+                PurchaseRequestItem(item_id="paper", quantity=1, unit_price=5.0),
+                PurchaseRequestItem(item_id="desk", quantity=1, unit_price=250.0),
+            ],
+        )
+
+
+def test_purchase_orders_are_indexed_by_request(service: ProcurementService) -> None:
+    service.create_purchase_request(
+        "PR-005",
+        requester="Eve",
+        justification="Paper",
+        items=[PurchaseRequestItem(item_id="paper", quantity=4, unit_price=5.0)],
+    )
+    service.submit_purchase_request("PR-005")
+    service.approve_purchase_request("PR-005")
+    first = service.create_purchase_order("PO-005a", request_id="PR-005", supplier="ACME Corp")
+    second = service.create_purchase_order("PO-005b", request_id="PR-005", supplier="Paper Co")
+
+    repository = service.repository
+    assert list(repository.iter_purchase_orders_for_request("PR-005")) == [first, second]
+    assert list(repository.iter_purchase_orders_for_request("PR-missing")) == []
+
+    repository.save_purchase_order(first)
+    assert list(repository.iter_purchase_orders_for_request("PR-005")) == [first, second]
+
+    first.request_id = "PR-006"
+    repository.save_purchase_order(first)
+    assert list(repository.iter_purchase_orders_for_request("PR-005")) == [second]
+    assert list(repository.iter_purchase_orders_for_request("PR-006")) == [first]
+
+
+def _submit_paper_request(service: ProcurementService, request_id: str, quantity: int) -> None:
+    service.create_purchase_request(
+        request_id,
+        requester="Finance",
+        justification="Month-end restock",
+        items=[PurchaseRequestItem(item_id="paper", quantity=quantity, unit_price=5.0)],
+    )
+    service.submit_purchase_request(request_id)
+
+
+def test_batch_approval_reserves_combined_demand(service: ProcurementService) -> None:
+    _submit_paper_request(service, "PR-010", 40)
+    _submit_paper_request(service, "PR-011", 50)
+
+    approved = service.approve_purchase_requests(["PR-010", "PR-011"])
+
+    assert [request.status for request in approved] == [RequestStatus.APPROVED] * 2
+    assert approved[0].approved_at == approved[1].approved_at
+    assert service.repository.get_budget_by_category("office").committed == pytest.approx(450.0)
+
+
+def test_batch_approval_is_all_or_nothing(service: ProcurementService) -> None:
+    _submit_paper_request(service, "PR-012", 60)
+    _submit_paper_request(service, "PR-013", 60)
+
+    with pytest.raises(BudgetError):
+        service.approve_purchase_requests(["PR-012", "PR-013"])
+
+    repository = service.repository
+    assert repository.get_purchase_request("PR-012").status == RequestStatus.SUBMITTED
+    assert repository.get_purchase_request("PR-013").status == RequestStatus.SUBMITTED
+    assert repository.get_budget_by_category("office").committed == 0.0
+
+
+def test_batch_approval_rejects_category_without_budget(service: ProcurementService) -> None:
+    service.create_category("travel", "Travel")
+    service.create_item("ticket", "travel", "Train Ticket", unit_cost=80.0)
+    _submit_paper_request(service, "PR-014", 10)
+    service.create_purchase_request(
+        "PR-015",
+        requester="Finance",
+        justification="Trip",
+        items=[PurchaseRequestItem(item_id="ticket", quantity=1, unit_price=80.0)],
+    )
+    service.submit_purchase_request("PR-015")
+
+    with pytest.raises(BudgetError, match="travel"):
+        service.approve_purchase_requests(["PR-014", "PR-015"])
+
+    assert service.repository.get_purchase_request("PR-014").status == RequestStatus.SUBMITTED
+    assert service.repository.get_budget_by_category("office").committed == 0.0
+
+
+def test_payment_cap_uses_current_order_total(service: ProcurementService) -> None:
+    _submit_paper_request(service, "PR-020", 10)
+    service.approve_purchase_request("PR-020")
+    order = service.create_purchase_order("PO-020", request_id="PR-020", supplier="ACME Corp")
+    service.submit_purchase_order("PO-020")
+    service.approve_purchase_order("PO-020")
+    assert order.total_amount == 50.0
+
+    with pytest.raises(ValueError):
+        service.create_payment_request("PAY-020", "PO-020", amount=60.0, payee="ACME Corp")
+
+    order.add_item(PurchaseOrderItem(item_id="paper", quantity=2, unit_price=5.0))
+    payment = service.create_payment_request("PAY-020", "PO-020", amount=60.0, payee="ACME Corp")
+    assert payment.amount == 60.0
+
+
+def test_column_totals_match_row_totals(service: ProcurementService) -> None:
+    lines = [
+        PurchaseRequestItem(item_id="laptop", quantity=1, unit_price=1000.0),
+        PurchaseRequestItem(item_id="paper", quantity=2.5, unit_price=4.0),
+        PurchaseRequestItem(item_id="laptop", quantity=2, unit_price=900.0),
+    ]
+    request = service.create_purchase_request("PR-030", requester="Gus", justification="Mixed", items=lines)
+    row_wise = PurchaseRequest(id="PR-row", requester="Gus", justification="Mixed", items=list(lines))
+    catalogue = service.repository.item_categories
+
+    column_totals = request.by_category_totals(catalogue)
+    assert list(column_totals.items()) == list(row_wise.by_category_totals(catalogue).items())
+    assert list(column_totals) == ["it", "office"]
+
+    # Lines added after indexing are picked up by the row-wise path.
+    request.add_item(PurchaseRequestItem(item_id="paper", quantity=1, unit_price=5.0))
+    assert request.by_category_totals(catalogue) == {"it": 2800.0, "office": 15.0}
+
+
+def _bulk_request(service: ProcurementService, request_id: str, lines: int) -> PurchaseRequest:
+    items = [
+        PurchaseRequestItem(item_id="paper" if i % 3 else "laptop", quantity=1 + i % 4, unit_price=0.5 + i % 7)
+        for i in range(lines)
+    ]
+    return service.create_purchase_request(request_id, requester="Bulk", justification="Import", items=items)
+
+
+def test_large_request_falls_back_with_one_warning(
+    service: ProcurementService, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(_kernels, "_sum_by_category_jit", None)
+    monkeypatch.setattr(_kernels, "_fallback_warned", False)
+    catalogue = service.repository.item_categories
+    first = _bulk_request(service, "PR-040", _kernels.JIT_MIN_LINES * 2)
+    second = _bulk_request(service, "PR-041", _kernels.JIT_MIN_LINES * 2)
+    row_wise = PurchaseRequest(id="PR-row", requester="Bulk", justification="Import", items=list(first.items))
+
+    with pytest.warns(RuntimeWarning, match="numba is not installed") as record:
+        totals = first.by_category_totals(catalogue)
+    second.by_category_totals(catalogue)
+
+    assert len(record) == 1
+    assert record[0].filename == __file__
+    expected = row_wise.by_category_totals(catalogue)
+    assert list(totals) == list(expected)
+    assert all(totals[key] == pytest.approx(expected[key]) for key in expected)
+
+
+def test_jit_kernel_matches_row_totals(service: ProcurementService) -> None:
+    pytest.importorskip("numba")  # run with NUMBA_BOUNDSCHECK=1 to catch indexing bugs
+    request = _bulk_request(service, "PR-042", _kernels.JIT_MIN_LINES * 2)
+    row_wise = PurchaseRequest(id="PR-row", requester="Bulk", justification="Import", items=list(request.items))
+    catalogue = service.repository.item_categories
+
+    totals = request.by_category_totals(catalogue)
+    expected = row_wise.by_category_totals(catalogue)
+    assert all(totals[key] == pytest.approx(expected[key]) for key in expected)
+
+
+def test_timestamps_convert_to_utc_datetimes(service: ProcurementService) -> None:
+    _submit_paper_request(service, "PR-050", 1)
+    request = service.approve_purchase_request("PR-050", now=1_700_000_000.0)
+
+    assert request.approved_at == 1_700_000_000.0
+    assert request.approved_at_dt == datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc)
+    assert request.rejected_at_dt is None
+    assert request.created_at_dt.tzinfo is timezone.utc
+    assert request.created_at_dt.timestamp() == pytest.approx(request.created_at)
+
+
+def test_budget_available_tracks_every_change() -> None:
+    budget = BudgetRecord(id="budget", category_id="office", allocated=500.0)
+    assert budget.available == 500.0
+
+    budget.reserve(200.0)
+    assert budget.available == 300.0
+    budget.release(50.0)
+    assert budget.available == 350.0
+    budget.spend(180.0)
+    assert (budget.committed, budget.spent, budget.available) == (0.0, 180.0, 320.0)
+
+    budget.adjust_allocation(100.0)
+    assert budget.available == 420.0
+    with pytest.raises(ValueError):
+        budget.adjust_allocation(-500.0)
+    assert budget.available == 420.0
+
+
+def test_workflow_rejects_illegal_transitions(service: ProcurementService) -> None:
+    assert request_workflow.allows(RequestStatus.DRAFT, RequestStatus.SUBMITTED)
+    assert not request_workflow.allows(RequestStatus.DRAFT, RequestStatus.APPROVED)
+    assert not request_workflow.allows(RequestStatus.CANCELLED, RequestStatus.DRAFT)
+
+    request = service.create_purchase_request(
+        "PR-060",
+        requester="Hal",
+        justification="Paper",
+        items=[PurchaseRequestItem(item_id="paper", quantity=1, unit_price=5.0)],
+    )
+    with pytest.raises(ValueError, match="Invalid transition"):
+        request_workflow.transition(request, RequestStatus.DRAFT, RequestStatus.APPROVED)
+    assert request.approved_at is None
+    with pytest.raises(InvalidStatusTransition):
+        service.approve_purchase_request("PR-060")
+
+
+def test_missing_budget_leaves_other_budgets_untouched(service: ProcurementService) -> None:
+    service.create_category("travel", "Travel")
+    service.create_item("ticket", "travel", "Train Ticket", unit_cost=80.0)
+    request = service.create_purchase_request(
+        "PR-070",
+        requester="Ivy",
+        justification="Offsite",
+        items=[
+            PurchaseRequestItem(item_id="paper", quantity=10, unit_price=5.0),
+            PurchaseRequestItem(item_id="ticket", quantity=1, unit_price=80.0),
+        ],
+    )
+    controller = service.budget_controller
+    office = service.repository.get_budget_by_category("office")
+
+    with pytest.raises(BudgetError, match="travel"):
+        controller.reserve_for_request(request)
+    assert (office.committed, office.spent) == (0.0, 0.0)
+
+    order = PurchaseOrder(id="PO-070", request_id="PR-070", supplier="Rail Co")
+    with pytest.raises(BudgetError, match="travel"):
+        controller.spend_for_order(order)
+    assert (office.committed, office.spent) == (0.0, 0.0)